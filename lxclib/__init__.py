@@ -1 +1,8 @@
-from .main import Container
\ No newline at end of file
+def __getattr__(name):
+    # Container is imported on first access so that importing lxclib.cli does
+    # not pay for lxclib.main and its imports
+    if name == "Container":
+        from .main import Container
+
+        return Container
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
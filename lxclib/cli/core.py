@@ -1,6 +1,7 @@
 import argparse
+import functools
 import logging
-import shlex
+import sys
 
 import lxclib
 
@@ -11,100 +12,166 @@ logger = logging.getLogger(__name__)
 
 def list_containers(_args):
     if _args.json:
-        print(lxclib.Container.list_info())
+        print(lxclib.Container.list_info(_args.parallelism))
+    elif _args.details:
+        for c in lxclib.Container.list_all_with_info(_args.parallelism):
+            print(c, c.info())
     else:
         for c in lxclib.Container.list_all():
-            if _args.details:
-                print(c, c.info())
-            else:
-                print(c)
+            print(c)
 
 
-def attach_container(_args):
-    container = lxclib.Container(_args.name)
-    try:
-        container.attach(
-            shlex.split(_args.command),
-            bind=not _args.no_bind,
-            force_run=_args.force_run,
-            force=_args.force,
+def _names(_args):
+    """return names of the containers given by --name and --glob"""
+    names = list(_args.name or [])
+    if _args.glob is not None:
+        import fnmatch
+
+        names += fnmatch.filter(
+            (c.name for c in lxclib.Container.list_all()), _args.glob
         )
-    except lxclib.Container.SystemdRunError as err:
+    return list(dict.fromkeys(names))
+
+
+def _log_error(name: str, err: Exception):
+    if isinstance(err, lxclib.Container.SystemdRunError):
         logger.critical("Command %s failed with %s", err.pretty_command, err.output)
+    elif isinstance(err, lxclib.Container.MustUseForceError):
+        logger.critical("Action impossible on container %s, try using --force", name)
+    elif isinstance(err, lxclib.Container.MissingInformationsError):
+        logger.critical("Container %s is missing informations to be created", name)
+    else:
+        logger.critical("Action on container %s failed with %r", name, err)
+
+
+def _log_results(results: dict):
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            _log_error(name, result)
+
+
+def _systemd_safe(fn):
+    """log lxclib errors raised by fn(container, _args) instead of failing"""
+
+    @functools.wraps(fn)
+    def wrapper(container, _args):
+        try:
+            return fn(container, _args)
+        except (
+            lxclib.Container.SystemdRunError,
+            lxclib.Container.MustUseForceError,
+        ) as err:
+            _log_error(container.name, err)
+
+    return wrapper
+
+
+@_systemd_safe
+def _attach(container, _args):
+    import shlex
+
+    container.attach(
+        shlex.split(_args.command),
+        bind=not _args.no_bind,
+        force_run=_args.force_run,
+        force=_args.force,
+    )
+
+
+@_systemd_safe
+def _create(container, _args):
+    container.create()
+
+
+@_systemd_safe
+def _info(container, _args):
+    print(container.info())
+
+
+def attach_container(_args):
+    for name in _names(_args):
+        _attach(lxclib.Container(name), _args)
 
 
 def start_container(_args):
-    container = lxclib.Container(_args.name)
-    try:
-        container.start()
-    except lxclib.Container.SystemdRunError as err:
-        logger.critical("Command %s failed with %s", err.pretty_command, err.output)
+    _log_results(
+        lxclib.Container.bulk_start(_names(_args), parallelism=_args.parallelism)
+    )
 
 
 def stop_container(_args):
-    container = lxclib.Container(_args.name)
-    try:
-        container.stop()
-    except lxclib.Container.SystemdRunError as err:
-        logger.critical("Command %s failed with %s", err.pretty_command, err.output)
+    _log_results(
+        lxclib.Container.bulk_stop(_names(_args), parallelism=_args.parallelism)
+    )
 
 
 def restart_container(_args):
-    stop_container(_args)
-    start_container(_args)
+    _log_results(
+        lxclib.Container.bulk_restart(_names(_args), parallelism=_args.parallelism)
+    )
 
 
 def destroy_container(_args):
-    container = lxclib.Container(_args.name)
-    try:
-        container.destroy(force=_args.force)
-    except lxclib.Container.SystemdRunError as err:
-        logger.critical("Command %s failed with %s", err.pretty_command, err.output)
-    except lxclib.Container.MustUseForceError:
-        logger.critical("Container cannot be destroyed, try using --force")
+    _log_results(
+        lxclib.Container.bulk_destroy(
+            _names(_args), force=_args.force, parallelism=_args.parallelism
+        )
+    )
 
 
 def create_container(_args):
-    container = lxclib.Container(
-        _args.name, _args.distribution, _args.release, _args.architecture
-    )
-    try:
-        container.create()
-    except lxclib.Container.SystemdRunError as err:
-        logger.critical("Command %s failed with %s", err.pretty_command, err.output)
+    for name in _names(_args):
+        container = lxclib.Container(
+            name, _args.distribution, _args.release, _args.architecture
+        )
+        _create(container, _args)
 
 
 def info_container(_args):
-    container = lxclib.Container(_args.name)
-    try:
-        print(container.info())
-    except lxclib.Container.SystemdRunError as err:
-        logger.critical("Command %s failed with %s", err.pretty_command, err.output)
+    for name in _names(_args):
+        _info(lxclib.Container(name), _args)
 
 
 def config_container(_args):
-    container = lxclib.Container(_args.name)
+    names = _names(_args)
+    if len(names) != 1:
+        logger.critical("Config needs exactly one container, got %s", names)
+        return
+    container = lxclib.Container(names[0])
     if _args.show:
         return utils.open_in_pager(container.config_file.absolute())
     if _args.edit:
         return utils.open_in_editor(container.config_file.absolute())
 
 
-def run():
-    logging.basicConfig()
+def _positive_int(value: str):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a positive integer")
+    return number
 
-    parser = argparse.ArgumentParser()
-    parser.set_defaults(func=parser.print_help)
-    subparser = parser.add_subparsers()
+
+def _p_list(subparser):
     list_parser = subparser.add_parser("list")
     list_parser.add_argument("--json", action="store_true")
     list_parser.add_argument("--details", action="store_true")
+    list_parser.add_argument("--parallelism", type=_positive_int)
     list_parser.set_defaults(func=list_containers)
 
+
+def _p_container(subparser):
     parser_container = subparser.add_parser("container")
-    parser_container.add_argument("--name", type=str, required=True)
-    subparser_container = parser_container.add_subparsers()
+    names_group = parser_container.add_mutually_exclusive_group(required=True)
+    names_group.add_argument("--name", type=str, action="append")
+    names_group.add_argument("--glob", type=str)
+    parser_container.add_argument("--parallelism", type=_positive_int)
+    return parser_container.add_subparsers()
+
 
+def _p_attach(subparser_container):
     attach_parser = subparser_container.add_parser("attach", aliases=["exec"])
     attach_parser.add_argument("command", type=str)
     attach_parser.add_argument("--no-bind", action="store_true", required=False)
@@ -112,33 +179,120 @@ def run():
     attach_parser.add_argument("--force", action="store_true", required=False)
     attach_parser.set_defaults(func=attach_container)
 
+
+def _p_start(subparser_container):
     start_parser = subparser_container.add_parser("start")
     start_parser.set_defaults(func=start_container)
 
+
+def _p_stop(subparser_container):
     stop_parser = subparser_container.add_parser("stop")
     stop_parser.set_defaults(func=stop_container)
 
+
+def _p_restart(subparser_container):
     restart_parser = subparser_container.add_parser("restart")
     restart_parser.set_defaults(func=restart_container)
 
+
+def _p_destroy(subparser_container):
     destroy_parser = subparser_container.add_parser("destroy")
     destroy_parser.add_argument("--force", action="store_true")
     destroy_parser.set_defaults(func=destroy_container)
 
+
+def _p_create(subparser_container):
     create_parser = subparser_container.add_parser("create")
     create_parser.add_argument("--distribution", type=str, required=True)
     create_parser.add_argument("--release", type=str, required=True)
     create_parser.add_argument("--architecture", type=str, required=True)
     create_parser.set_defaults(func=create_container)
 
+
+def _p_info(subparser_container):
     info_parser = subparser_container.add_parser("info")
     info_parser.add_argument("--json", action="store_true")
     info_parser.set_defaults(func=info_container)
 
+
+def _p_config(subparser_container):
     config_parser = subparser_container.add_parser("config")
     config_parser.add_argument("--show", action="store_true")
     config_parser.add_argument("--edit", action="store_true")
     config_parser.set_defaults(func=config_container)
 
-    args = parser.parse_args()
+
+CONTAINER_BUILDERS = {
+    "attach": _p_attach,
+    "exec": _p_attach,
+    "start": _p_start,
+    "stop": _p_stop,
+    "restart": _p_restart,
+    "destroy": _p_destroy,
+    "create": _p_create,
+    "info": _p_info,
+    "config": _p_config,
+}
+
+# options of the container parser taking a value
+CONTAINER_VALUED_OPTIONS = ("--name", "--glob", "--parallelism")
+
+
+def _first_positional(argv: list[str], valued_options=()):
+    """return first positional argument of argv
+
+    None if help is asked or an unknown option, like an abbreviated one, is
+    given before it
+    """
+    _skip = False
+    for arg in argv:
+        if _skip:
+            _skip = False
+        elif arg in valued_options:
+            _skip = True
+        elif arg.partition("=")[0] in valued_options:
+            continue
+        elif arg.startswith("-"):
+            return None
+        else:
+            return arg
+    return None
+
+
+def _build_list(subparser, argv: list[str] | None = None):
+    _p_list(subparser)
+
+
+def _build_container(subparser, argv: list[str] | None = None):
+    subparser_container = _p_container(subparser)
+    command = None
+    if argv is not None:
+        command = _first_positional(argv, CONTAINER_VALUED_OPTIONS)
+    if command in CONTAINER_BUILDERS:
+        CONTAINER_BUILDERS[command](subparser_container)
+        return
+    for builder in dict.fromkeys(CONTAINER_BUILDERS.values()):
+        builder(subparser_container)
+
+
+BUILDERS = {"list": _build_list, "container": _build_container}
+
+
+def run():
+    logging.basicConfig()
+
+    argv = sys.argv[1:]
+    parser = argparse.ArgumentParser()
+    parser.set_defaults(func=parser.print_help)
+    subparser = parser.add_subparsers()
+
+    # only build the parsers needed by the requested command, all of them
+    # when asking for help or when the command is unknown
+    if argv and argv[0] in BUILDERS:
+        BUILDERS[argv[0]](subparser, argv[1:])
+    else:
+        for builder in BUILDERS.values():
+            builder(subparser)
+
+    args = parser.parse_args(argv)
     args.func(args)
@@ -1,25 +1,24 @@
 import os
-import subprocess
+import signal
 import sys
 from pathlib import Path
 
 
 def _open_in(filepath: Path, editor: str):
-    command = [editor, filepath.as_posix()]
-    process = subprocess.Popen(
-        command,
-        stdin=sys.stdin,
-        stdout=sys.stdout,
-        stderr=sys.stderr,
-    )
-    ret_code = process.wait()
-    if ret_code != 0:
-        raise RuntimeError(f"Failed to open {filepath} in {editor}")
+    """replace current process by editor opening filepath, does not return"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # restore the signals Python ignores, exec keeps them ignored otherwise
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    signal.signal(signal.SIGXFSZ, signal.SIG_DFL)
+    os.execvp(editor, [editor, filepath.as_posix()])
 
 
 def open_in_editor(filepath: Path):
+    """open filepath in $EDITOR, does not return"""
     return _open_in(filepath, os.environ.get("EDITOR", "less"))
 
 
 def open_in_pager(filepath: Path):
+    """open filepath in $PAGER, does not return"""
     return _open_in(filepath, os.environ.get("PAGER", "less"))
@@ -1,8 +1,148 @@
+import asyncio
+import atexit
+import copy
 import enum
+import json
+import os
+import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache, cached_property
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterable, Optional
+
+from .utils import spawn_wait
+
+# opened once and shared by all lxc-* calls instead of subprocess.DEVNULL
+_DEVNULL_FD = os.open(os.devnull, os.O_WRONLY)
+atexit.register(os.close, _DEVNULL_FD)
+
+# default lxcpath of unprivileged users, container_folder and config_file
+# assume containers live there
+_LXC_ROOT = Path.home() / ".local/share/lxc"
+# resolved once instead of searching PATH on every spawn
+_SYSTEMD_RUN = shutil.which("systemd-run") or "systemd-run"
+_LXC_LS = shutil.which("lxc-ls") or "lxc-ls"
+_LXC_INFO = shutil.which("lxc-info") or "lxc-info"
+_LXC_START = shutil.which("lxc-start") or "lxc-start"
+_LXC_STOP = shutil.which("lxc-stop") or "lxc-stop"
+_LXC_CREATE = shutil.which("lxc-create") or "lxc-create"
+_LXC_DESTROY = shutil.which("lxc-destroy") or "lxc-destroy"
+_LXC_ATTACH = shutil.which("lxc-attach") or "lxc-attach"
+
+_UNIT_OPS = ("start", "stop", "create", "destroy", "attach")
+_SYSTEMD_RUN_PREFIX = (_SYSTEMD_RUN, "--user", "--scope", "-p", "Delegate=yes")
+_LXC_LS_ARGV = (_LXC_LS, "--line")
+_LXC_LS_FANCY_ARGV = (_LXC_LS, "--fancy", "--fancy-format", "name,state,ipv4,ipv6,pid")
+_LXC_STATE_ARGV_TMPL = (_LXC_INFO, "--state", "--name")
+_LXC_INFO_ARGV_TMPL = (_LXC_INFO, "--state", "--ips", "--pid", "--name")
+
+# default number of containers handled concurrently by bulk operations
+_PARALLELISM = 16
+
+# lxc-* results are reused for this many seconds, 0 disables caching
+_CACHE_TTL = float(os.environ.get("LXCLIB_CACHE_TTL", "1"))
+_cache: dict[tuple, tuple[float, Any]] = {}
+_cache_lock = threading.Lock()
+# bumped on each invalidation of a key
+_generations: dict[tuple, int] = {}
+
+# containers names are shared between processes for this many seconds,
+# 0 disables it
+_LIST_TTL = float(os.environ.get("LXCLIB_LIST_TTL", "0"))
+
+
+def _cached(key: tuple, fn: Callable[[], Any], ttl: float = _CACHE_TTL):
+    """return fn() result, reusing the one computed less than ttl seconds ago"""
+    if ttl <= 0:
+        return fn()
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        generation = _generations.get(key, 0)
+    if entry is not None and now - entry[0] < ttl:
+        return entry[1]
+    value = fn()
+    with _cache_lock:
+        # a result probed before an invalidation of key may already be stale
+        if _generations.get(key, 0) == generation:
+            _cache[key] = (now, value)
+    return value
+
+
+def _invalidate(*keys: tuple):
+    """drop cached results for keys"""
+    with _cache_lock:
+        for key in keys:
+            _cache.pop(key, None)
+            _generations[key] = _generations.get(key, 0) + 1
+
+
+def _parallelism(parallelism: Optional[int] = None) -> int:
+    """return parallelism, or the default one if not given"""
+    if parallelism is None:
+        return _PARALLELISM
+    if parallelism < 1:
+        raise ValueError(f"parallelism must be positive, got {parallelism}")
+    return parallelism
+
+
+@cache
+def _uses_default_lxcpath() -> bool:
+    """return whether lxc looks for containers in _LXC_ROOT
+
+    false for root or when lxc.lxcpath is set in the user lxc.conf
+    """
+    if os.geteuid() == 0:
+        return False
+    # lxc reads the user config from the home directory, not XDG_CONFIG_HOME
+    try:
+        _lines = (Path.home() / ".config/lxc/lxc.conf").read_text().splitlines()
+    except OSError:
+        return True
+    _lxcpath = _LXC_ROOT
+    for _line in _lines:
+        _key, _sep, _value = _line.partition("=")
+        if _sep and _key.strip() == "lxc.lxcpath":
+            _lxcpath = Path(_value.strip()).expanduser()
+    return _lxcpath == _LXC_ROOT
+
+
+def _list_cache_file() -> Optional[Path]:
+    """return path of the file caching containers names, if any"""
+    _runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not _runtime_dir:
+        return None
+    return Path(_runtime_dir) / "lxclib-list.json"
+
+
+def _write_atomic(path: Path, text: str):
+    """replace path content by text, readers never see a partial file"""
+    try:
+        _tmp = tempfile.NamedTemporaryFile(
+            "w", dir=path.parent, prefix=f"{path.name}.", delete=False
+        )
+    except OSError:
+        return
+    try:
+        with _tmp:
+            _tmp.write(text)
+        os.replace(_tmp.name, path)
+    except OSError:
+        Path(_tmp.name).unlink(missing_ok=True)
+
+
+def _forget_names():
+    """drop cached containers names, after a container is created or destroyed"""
+    _invalidate((None, "list_all"))
+    _cache_file = _list_cache_file()
+    if _cache_file is not None:
+        _cache_file.unlink(missing_ok=True)
 
 
 class Container:
@@ -38,6 +178,9 @@ class Container:
         STOPPED = 1
         ABSENT = 2
 
+    # plain dict lookup, faster than State[name] going through EnumMeta
+    _STATE_BY_NAME = {s.name: s for s in State}
+
     def __init__(
         self,
         name: str,
@@ -49,6 +192,9 @@ class Container:
         self.distribution = distribution
         self.release = release
         self.architecture = architecture
+        self._info: Optional[dict] = None
+        # systemd unit names prefixes, by op
+        self._unit_prefixes = {op: f"lxc-{op}-{name}" for op in _UNIT_OPS}
 
     def __str__(self) -> str:
         return self.name
@@ -56,47 +202,192 @@ class Container:
     @property
     def state(self):
         """get container state"""
-        try:
-            _out = subprocess.check_output(
-                ["lxc-info", "--state", "--name", self.name],
-                stderr=subprocess.DEVNULL,
-            )
-        except subprocess.CalledProcessError:
+        return _cached((self.name, "state"), self._probe_state)
+
+    def _probe_state(self):
+        if not self._exists_fast():
             return self.State.ABSENT
-        _state = _out.decode().split(":")[1].strip().upper()
-        return self.State[_state]
+        with subprocess.Popen(
+            [*_LXC_STATE_ARGV_TMPL, self.name],
+            stdout=subprocess.PIPE,
+            stderr=_DEVNULL_FD,
+            text=True,
+        ) as _process:
+            _line = _process.stdout.readline()
+        if _process.returncode != 0:
+            return self.State.ABSENT
+        _state = _line.partition(":")[2].strip().upper()
+        return self._STATE_BY_NAME[_state]
 
     @classmethod
-    def list_all(cls):
-        """list all containers on the system"""
-        _out = subprocess.check_output(["lxc-ls", "--line"])
-        _containers = _out.decode().strip().split("\n")
+    def list_all(cls, ttl: float = _LIST_TTL):
+        """list all containers on the system
+
+        if ttl is positive, names are shared between processes through a cache
+        file for ttl seconds: containers created or destroyed outside of lxclib
+        may show up late
+        """
+        _containers = _cached((None, "list_all"), lambda: cls._read_names(ttl))
         return [Container(name=c) for c in _containers]
 
     @classmethod
-    def list_info(cls):
+    def _read_names(cls, ttl: float = 0):
+        _cache_file = _list_cache_file() if ttl > 0 else None
+        if _cache_file is not None:
+            try:
+                if _cache_file.stat().st_mtime > time.time() - ttl:
+                    return tuple(json.loads(_cache_file.read_text()))
+            except (OSError, ValueError):
+                pass
+        _names = cls._probe_names()
+        if _cache_file is not None:
+            _write_atomic(_cache_file, json.dumps(_names))
+        return _names
+
+    @classmethod
+    def _probe_names(cls):
+        _out = subprocess.check_output(_LXC_LS_ARGV)
+        return tuple(_out.decode().split())
+
+    @classmethod
+    def list_all_with_info(cls, parallelism: Optional[int] = None):
+        """list all containers on the system with their infos prefetched
+
+        a single lxc-ls call is used, falling back to lxc-info calls, at most
+        parallelism at a time, if lxc-ls fails
+        """
+        try:
+            _out = subprocess.check_output(_LXC_LS_FANCY_ARGV, stderr=_DEVNULL_FD)
+        except subprocess.CalledProcessError:
+            _containers = cls.list_all()
+            _infos = cls._probe_infos(_containers, parallelism)
+            for c, i in zip(_containers, _infos):
+                c._info = i
+            return _containers
+
+        _containers = []
+        for _name, _infos in cls._parse_fancy(_out.decode()).items():
+            _container = Container(name=_name)
+            _container._info = _infos
+            _containers.append(_container)
+        return _containers
+
+    @classmethod
+    def _probe_infos(cls, containers: list, parallelism: Optional[int] = None):
+        """return infos of containers, with at most parallelism lxc-info running"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(cls._gather_infos(containers, parallelism))
+        # asyncio.run cannot be used from a running event loop
+        with ThreadPoolExecutor(max_workers=_parallelism(parallelism)) as executor:
+            return list(executor.map(cls._probe_info, containers))
+
+    @classmethod
+    async def _gather_infos(cls, containers: list, parallelism: Optional[int] = None):
+        _semaphore = asyncio.Semaphore(_parallelism(parallelism))
+        return await asyncio.gather(*(c._ainfo(_semaphore) for c in containers))
+
+    async def _ainfo(self, semaphore: asyncio.Semaphore):
+        if not self._exists_fast():
+            return {"state": self.State.ABSENT}
+        async with semaphore:
+            _process = await asyncio.create_subprocess_exec(
+                *_LXC_INFO_ARGV_TMPL,
+                self.name,
+                stdout=subprocess.PIPE,
+                stderr=_DEVNULL_FD,
+            )
+            _out, _ = await _process.communicate()
+        if _process.returncode != 0:
+            return {"state": self.State.ABSENT}
+        return self._parse_info(_out.decode().splitlines())
+
+    @classmethod
+    def list_info(cls, parallelism: Optional[int] = None):
         """return dict of containers infos"""
-        return {c.name: c.info() for c in cls.list_all()}
+        return {c.name: c.info() for c in cls.list_all_with_info(parallelism)}
+
+    @classmethod
+    def _bulk(
+        cls,
+        names: list[str],
+        action: str,
+        parallelism: Optional[int] = None,
+        **kwargs,
+    ):
+        """run action on each named container, at most parallelism at a time
+
+        return a dict of action results, or of raised errors, by container name
+        """
+
+        def _run(name):
+            try:
+                return getattr(Container(name), action)(**kwargs)
+            except Exception as err:  # reported by name, others still run
+                return err
+
+        if not names:
+            return {}
+        _workers = min(_parallelism(parallelism), len(names))
+        with ThreadPoolExecutor(max_workers=_workers) as executor:
+            return dict(zip(names, executor.map(_run, names)))
+
+    @classmethod
+    def bulk_start(
+        cls,
+        names: list[str],
+        force: bool = False,
+        check: bool = False,
+        parallelism: Optional[int] = None,
+    ):
+        """start containers concurrently, see start"""
+        return cls._bulk(names, "start", parallelism, force=force, check=check)
+
+    @classmethod
+    def bulk_stop(
+        cls, names: list[str], check: bool = False, parallelism: Optional[int] = None
+    ):
+        """stop containers concurrently, see stop"""
+        return cls._bulk(names, "stop", parallelism, check=check)
+
+    @classmethod
+    def bulk_restart(
+        cls,
+        names: list[str],
+        force: bool = False,
+        check: bool = False,
+        parallelism: Optional[int] = None,
+    ):
+        """restart containers concurrently, see restart"""
+        return cls._bulk(names, "restart", parallelism, force=force, check=check)
+
+    @classmethod
+    def bulk_destroy(
+        cls,
+        names: list[str],
+        force: bool = False,
+        check: bool = False,
+        parallelism: Optional[int] = None,
+    ):
+        """destroy containers concurrently, see destroy"""
+        return cls._bulk(names, "destroy", parallelism, force=force, check=check)
 
     def _systemd_run(self, unit_name: str, command: list[str], bind: bool = False):
-        complete_command = [
-            "systemd-run",
-            "--unit",
-            unit_name,
-            "--user",
-            "--scope",
-            "-p",
-            "Delegate=yes",
-            "--",
-        ] + command
+        complete_command = [*_SYSTEMD_RUN_PREFIX, "--unit", unit_name, "--", *command]
+        try:
+            self._run(complete_command, bind)
+        finally:
+            self._invalidate_cache()
+
+    def _run(self, complete_command: list[str], bind: bool = False):
         if bind:
-            process = subprocess.Popen(
+            ret_code = spawn_wait(
                 complete_command,
-                stdin=sys.stdin,
-                stdout=sys.stdout,
-                stderr=sys.stderr,
+                stdin=sys.stdin.fileno(),
+                stdout=sys.stdout.fileno(),
+                stderr=sys.stderr.fileno(),
             )
-            ret_code = process.wait()
             if ret_code != 0:
                 raise self.SystemdRunError(command=complete_command, output=None)
         else:
@@ -111,15 +402,25 @@ class Container:
                     command=complete_command, output=err.output.decode()
                 )
 
+    def _invalidate_cache(self):
+        """forget cached results about this container after acting on it"""
+        self._info = None
+        _invalidate((self.name, "state"), (self.name, "info"))
+
+    def _unit_name(self, op: str):
+        """return a systemd unit name for op, unique across invocations
+
+        systemd-run refuses to start a unit whose name is already in use
+        """
+        return f"{self._unit_prefixes[op]}-{os.getpid()}-{time.monotonic_ns()}"
+
     def _systemd_run_stop(self):
-        command = ["lxc-stop", "--name", self.name]
-        unit_name = "lxc-stop-" + self.name
-        return self._systemd_run(unit_name, command)
+        command = [_LXC_STOP, "--name", self.name]
+        return self._systemd_run(self._unit_name("stop"), command)
 
     def _systemd_run_start(self):
-        command = ["lxc-start", "--name", self.name]
-        unit_name = "lxc-start-" + self.name
-        return self._systemd_run(unit_name, command)
+        command = [_LXC_START, "--name", self.name]
+        return self._systemd_run(self._unit_name("start"), command)
 
     def _systemd_run_create(self):
         if (
@@ -128,8 +429,13 @@ class Container:
             or self.architecture is None
         ):
             raise self.MissingInformationsError()
-        command = ["lxc-create", "--template", "download", "--name", self.name, "--"]
-        options = [
+        command = [
+            _LXC_CREATE,
+            "--template",
+            "download",
+            "--name",
+            self.name,
+            "--",
             "--dist",
             self.distribution,
             "--release",
@@ -137,66 +443,92 @@ class Container:
             "--arch",
             self.architecture,
         ]
-        unit_name = "lxc-create-" + self.name
-        return self._systemd_run(unit_name, command + options)
+        try:
+            return self._systemd_run(self._unit_name("create"), command)
+        finally:
+            _forget_names()
 
     def _systemd_run_destroy(self):
-        command = ["lxc-destroy", "--name", self.name]
-        unit_name = "lxc-destroy-" + self.name
-        return self._systemd_run(unit_name, command)
+        command = [_LXC_DESTROY, "--name", self.name]
+        try:
+            return self._systemd_run(self._unit_name("destroy"), command)
+        finally:
+            _forget_names()
 
     def _systemd_run_attach(
         self, inner_command: Optional[list[str]] = None, bind: bool = False
     ):
-        command = ["lxc-attach", "--name", self.name]
+        command = [_LXC_ATTACH, "--name", self.name]
         if inner_command is not None:
             command.append("--")
-            command += inner_command
-        unit_name = "lxc-attach-" + self.name
-        return self._systemd_run(unit_name, command, bind)
+            command.extend(inner_command)
+        return self._systemd_run(self._unit_name("attach"), command, bind)
+
+    def _exists_fast(self) -> bool:
+        """return whether container may exist, without spawning lxc-info
 
-    def stop(self, check: bool = False):
+        only a missing config under the default lxcpath proves it is absent
+        """
+        return not _uses_default_lxcpath() or self.config_file.exists()
+
+    def _with_state(self, state: Optional[State] = None):
+        """return state if given, probe the container state otherwise"""
+        return self.state if state is None else state
+
+    def stop(self, check: bool = False, _state: Optional[State] = None):
         """stop container"""
-        if self.state == self.State.STOPPED:
+        if self._with_state(_state) == self.State.STOPPED:
             return False
         if not check:
             self._systemd_run_stop()
         return True
 
-    def start(self, force: bool = False, check: bool = False):
+    def start(
+        self, force: bool = False, check: bool = False, _state: Optional[State] = None
+    ):
         """start container, if force make sure container exists"""
-        if self.state == self.State.RUNNING:
+        current = self._with_state(_state)
+        if current == self.State.RUNNING:
             return False
-        if self.state == self.State.ABSENT and not force:
+        if current == self.State.ABSENT and not force:
             raise self.MustUseForceError()
-        self.create(check=check)
+        self.create(check=check, _state=current)
         if not check:
             self._systemd_run_start()
         return True
 
-    def create(self, check: bool = False):
+    def create(self, check: bool = False, _state: Optional[State] = None):
         """create container"""
-        if self.state != self.State.ABSENT:
+        if self._with_state(_state) != self.State.ABSENT:
             return False
         if not check:
             self._systemd_run_create()
         return True
 
-    def destroy(self, force: bool = False, check: bool = False):
+    def destroy(
+        self, force: bool = False, check: bool = False, _state: Optional[State] = None
+    ):
         """destroy container, if force stop it"""
-        if self.state == self.State.ABSENT:
+        current = self._with_state(_state)
+        if current == self.State.ABSENT:
             return False
-        if self.state != self.state.STOPPED and not force:
+        if current != self.State.STOPPED and not force:
             raise self.MustUseForceError()
-        self.stop(check=check)
+        self.stop(check=check, _state=current)
         if not check:
             self._systemd_run_destroy()
         return True
 
-    def restart(self, force: bool = False, check: bool = False):
+    def restart(
+        self, force: bool = False, check: bool = False, _state: Optional[State] = None
+    ):
         """restart lxc container"""
-        self.stop(check)
-        self.start(force, check)
+        current = self._with_state(_state)
+        self.stop(check, _state=current)
+        # once really stopped there is no need to probe the container again
+        if current == self.State.RUNNING and not check:
+            current = self.State.STOPPED
+        self.start(force, check, _state=current)
         return True
 
     def attach(
@@ -206,46 +538,95 @@ class Container:
         force_run: bool = False,
         force: bool = False,
         check: bool = False,
+        _state: Optional[State] = None,
     ):
         """attach lxc container"""
         force_run = force_run or force
-        if self.state != self.State.RUNNING and not force_run:
+        current = self._with_state(_state)
+        if current != self.State.RUNNING and not force_run:
             raise self.MustUseForceError()
-        self.start(force=force, check=check)
+        self.start(force=force, check=check, _state=current)
         if not check:
             self._systemd_run_attach(command, bind)
         return True
 
     def info(self):
-        """return container infos"""
-        try:
-            _out = subprocess.check_output(
-                ["lxc-info", "--state", "--ips", "--pid", "--name", self.name],
-                stderr=subprocess.DEVNULL,
-            )
-        except subprocess.CalledProcessError:
+        """return container infos, or the ones prefetched by list_all_with_info"""
+        if self._info is not None:
+            return copy.deepcopy(self._info)
+        # cached infos are shared, callers get their own copy
+        return copy.deepcopy(_cached((self.name, "info"), self._probe_info))
+
+    def _probe_info(self):
+        if not self._exists_fast():
             return {"state": self.State.ABSENT}
+        with subprocess.Popen(
+            [*_LXC_INFO_ARGV_TMPL, self.name],
+            stdout=subprocess.PIPE,
+            stderr=_DEVNULL_FD,
+            text=True,
+        ) as _process:
+            _infos = self._parse_info(_process.stdout)
+        if _process.returncode != 0:
+            return {"state": self.State.ABSENT}
+        return _infos
 
-        _infos = {}
-        for _info in _out.decode().strip().split("\n"):
-            _info = _info.split(":")
-            _info_key = _info[0].lower()
-            if _info_key in _infos:
-                if not isinstance(_infos[_info_key], list):
-                    _infos[_info_key] = [_infos[_info_key]]
-                _infos[_info_key].append(_info[1].strip().lower())
-            else:
-                _infos[_info_key] = _info[1].strip().lower()
+    @classmethod
+    def _parse_info(cls, lines: Iterable[str]):
+        """parse lxc-info output lines into a dict of infos, in a single pass"""
+        _values = defaultdict(list)
+        for _line in lines:
+            _info_key, _sep, _info_value = _line.partition(":")
+            if _sep:
+                _values[_info_key.lower()].append(_info_value.strip().lower())
+        # keys seen once, like state or pid, hold a value, others a list
+        _infos = {k: v[0] if len(v) == 1 else v for k, v in _values.items()}
         if "state" in _infos:
-            _infos["state"] = self.State[_infos["state"].upper()]
+            _infos["state"] = cls._STATE_BY_NAME[_infos["state"].upper()]
         return _infos
 
-    @property
+    @classmethod
+    def _parse_fancy(cls, text: str):
+        """parse lxc-ls fancy output into a dict of infos by container name
+
+        columns are located using the header as values may contain spaces
+        """
+        _lines = text.rstrip().split("\n")
+        _header = _lines[0]
+        _starts = [
+            i
+            for i, c in enumerate(_header)
+            if c != " " and (i == 0 or _header[i - 1] == " ")
+        ]
+        _keys = _header.lower().split()
+        _containers = {}
+        for _line in _lines[1:]:
+            _values = {
+                k: _line[start:end].strip()
+                for k, start, end in zip(_keys, _starts, _starts[1:] + [None])
+            }
+            _infos = {"state": cls._STATE_BY_NAME[_values["state"].upper()]}
+            if _values["pid"] != "-":
+                _infos["pid"] = _values["pid"]
+            _ips = [
+                ip.strip().lower()
+                for column in ("ipv4", "ipv6")
+                if _values[column] != "-"
+                for ip in _values[column].split(",")
+            ]
+            if len(_ips) == 1:
+                _infos["ip"] = _ips[0]
+            elif _ips:
+                _infos["ip"] = _ips
+            _containers[_values["name"]] = _infos
+        return _containers
+
+    @cached_property
     def container_folder(self):
         """return path to folder containing rootfs and config of the container"""
-        return Path.home() / Path(".local/share/lxc") / self.name
+        return _LXC_ROOT / self.name
 
-    @property
+    @cached_property
     def config_file(self):
         """return container config file path"""
         return self.container_folder / "config"
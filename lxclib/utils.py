@@ -0,0 +1,31 @@
+import os
+import signal
+from typing import Optional
+
+
+def spawn_wait(
+    argv: list[str],
+    stdin: Optional[int] = None,
+    stdout: Optional[int] = None,
+    stderr: Optional[int] = None,
+) -> int:
+    """spawn argv searched in PATH, wait for it and return its exit code
+
+    stdin, stdout and stderr are file descriptors given to the process, the
+    ones of the current process are inherited when not given
+    """
+    file_actions = [
+        (os.POSIX_SPAWN_DUP2, fd, target)
+        for fd, target in ((stdin, 0), (stdout, 1), (stderr, 2))
+        if fd is not None and fd != target
+    ]
+    # restore the signals Python ignores, as subprocess does
+    pid = os.posix_spawnp(
+        argv[0],
+        argv,
+        os.environ,
+        file_actions=file_actions,
+        setsigdef=(signal.SIGPIPE, signal.SIGXFSZ),
+    )
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)